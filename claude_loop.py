@@ -10,8 +10,11 @@ Usage:
     claude-loop stop      Cancel a running loop
 """
 
+from functools import lru_cache
 from pathlib import Path
 import json
+import os
+import re
 import sys
 
 WORK_PROMPT = """\
@@ -52,6 +55,12 @@ describe what remains before the keyword.
 {prompt}
 """
 
+KEYWORD_RE = re.compile(r'TASK_COMPLETE|REVIEW_OKAY|REVIEW_INCOMPLETE')
+
+# Keywords are requested as standalone messages at the end of a turn, so only
+# the tail of the last assistant message is searched.
+KEYWORD_TAIL = 512
+
 
 def main():
     if len(sys.argv) > 1 and sys.argv[1] == 'hook':
@@ -106,8 +115,11 @@ def hook():
     if loop_data is None:
         return
 
-    # Only catch Stop hooks.
-    event = json.loads(sys.stdin.read())
+    # Only catch Stop hooks. Skip decoding events that cannot be one.
+    raw = sys.stdin.read()
+    if '"Stop"' not in raw:
+        return
+    event = json.loads(raw)
     if event['hook_event_name'] != 'Stop':
         return
 
@@ -116,7 +128,7 @@ def hook():
     total = loop_data['total']
 
     # Check whether there was a completion keyword given by the agent.
-    last_msg = event.get('last_assistant_message', '')
+    last_msg = event.get('last_assistant_message', '')[-KEYWORD_TAIL:]
     keyword = find_keyword(last_msg)
 
     if iteration > total:
@@ -155,11 +167,16 @@ def hook():
 def read_loop_file():
     path = loop_file_path()
     if path and path.exists():
-        return json.load(path.open())
+        return json.loads(path.read_bytes())
 
 
 def write_loop_file(iteration, prompt, total):
-    json.dump({'iteration': iteration, 'prompt': prompt, 'total': total}, loop_file_path().open('w'))
+    # Write to a temporary file and rename, so readers never see a partial file.
+    path = loop_file_path()
+    tmp = path.with_suffix('.json.tmp')
+    data = {'iteration': iteration, 'prompt': prompt, 'total': total}
+    tmp.write_bytes(json.dumps(data).encode())
+    os.replace(tmp, path)
 
 
 def delete_loop_file():
@@ -174,8 +191,13 @@ def loop_file_path():
 
 
 def dot_claude_dir():
-    p = Path.cwd()
-    for p in [p, *p.parents]:
+    return find_dot_claude(Path.cwd())
+
+
+@lru_cache
+def find_dot_claude(cwd):
+    # Cached per directory: a single hook call looks up loop.json several times.
+    for p in [cwd, *cwd.parents]:
         if p == Path.home():
             break
         dot_claude = p / '.claude'
@@ -188,11 +210,10 @@ def find_keyword(text):
     """Check text for a loop keyword.
 
     Returns 'TASK_COMPLETE', 'REVIEW_OKAY', 'REVIEW_INCOMPLETE', or None.
+    The text is scanned once; if several keywords appear, the earliest wins.
     """
-    for kw in ('TASK_COMPLETE', 'REVIEW_OKAY', 'REVIEW_INCOMPLETE'):
-        if kw in text:
-            return kw
-    return None
+    match = KEYWORD_RE.search(text)
+    return match.group(0) if match else None
 
 
 if __name__ == '__main__':
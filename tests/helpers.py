@@ -1,12 +1,18 @@
 """Shared test helpers for claude_loop."""
 
+import io
 import json
 import os
-import subprocess
 import sys
+from collections import namedtuple
+from contextlib import redirect_stderr, redirect_stdout
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+import claude_loop
+
+Result = namedtuple("Result", ["returncode", "stdout", "stderr"])
 
 
 def make_project(tmp_path):
@@ -31,31 +37,37 @@ def write_loop_file(dot_claude, iteration, prompt, total):
     }))
 
 
-def run_claude_loop(cwd, func, stdin_text):
-    """Run a claude_loop function as a subprocess with piped stdin."""
-    env = os.environ.copy()
-    env["PYTHONPATH"] = str(PROJECT_ROOT)
-    result = subprocess.run(
-        [sys.executable, "-c", f"import claude_loop; claude_loop.{func}()"],
-        input=stdin_text,
-        capture_output=True,
-        text=True,
-        cwd=str(cwd),
-        env=env,
-    )
-    return result
+def reset_state():
+    """Clear claude_loop's per-process caches, as a fresh process would start."""
+    claude_loop.find_dot_claude.cache_clear()
+
+
+def run_claude_loop(cwd, func, stdin_text, argv=()):
+    """Run a claude_loop function in-process with cwd, argv and stdin swapped in.
+
+    Exits via sys.exit() are reported through the return code, like a subprocess.
+    """
+    reset_state()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    old_cwd, old_argv, old_stdin = os.getcwd(), sys.argv, sys.stdin
+    os.chdir(cwd)
+    sys.argv = ["claude-loop", *argv]
+    sys.stdin = io.StringIO(stdin_text)
+    returncode = 0
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            getattr(claude_loop, func)()
+    except SystemExit as e:
+        returncode = e.code or 0
+    finally:
+        os.chdir(old_cwd)
+        sys.argv, sys.stdin = old_argv, old_stdin
+    return Result(returncode, stdout.getvalue(), stderr.getvalue())
 
 
 def run_main(cwd, args, stdin_text=""):
-    """Run claude_loop.main() as a subprocess with given argv and stdin."""
-    env = os.environ.copy()
-    env["PYTHONPATH"] = str(PROJECT_ROOT)
-    argv = ["claude-loop"] + args
-    code = f"import sys; sys.argv = {argv!r}; import claude_loop; claude_loop.main()"
-    return subprocess.run(
-        [sys.executable, "-c", code],
-        input=stdin_text, capture_output=True, text=True, cwd=str(cwd), env=env,
-    )
+    """Run claude_loop.main() in-process with given argv and stdin."""
+    return run_claude_loop(cwd, "main", stdin_text, argv=args)
 
 
 def run_start(cwd, stdin_text):
@@ -1,9 +1,12 @@
 """Unit and integration tests for claude_loop core logic."""
 
 import json
+import os
 import sys
 from pathlib import Path
 
+import pytest
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent))
 import claude_loop
@@ -13,25 +16,18 @@ from helpers import make_project, read_loop_file, write_loop_file, run_main, run
 
 # --- Unit tests: find_keyword ---
 
-class TestFindKeyword:
-    def test_task_complete(self):
-        assert claude_loop.find_keyword("blah TASK_COMPLETE blah") == "TASK_COMPLETE"
-
-    def test_review_okay(self):
-        assert claude_loop.find_keyword("REVIEW_OKAY") == "REVIEW_OKAY"
-
-    def test_review_incomplete(self):
-        assert claude_loop.find_keyword("some text REVIEW_INCOMPLETE more") == "REVIEW_INCOMPLETE"
-
-    def test_no_keyword(self):
-        assert claude_loop.find_keyword("just normal text") is None
-
-    def test_empty(self):
-        assert claude_loop.find_keyword("") is None
-
-    def test_priority_task_complete_first(self):
-        # TASK_COMPLETE is checked first due to iteration order
-        assert claude_loop.find_keyword("TASK_COMPLETE REVIEW_OKAY") == "TASK_COMPLETE"
+@pytest.mark.parametrize("text,expected", [
+    ("blah TASK_COMPLETE blah", "TASK_COMPLETE"),
+    ("REVIEW_OKAY", "REVIEW_OKAY"),
+    ("some text REVIEW_INCOMPLETE more", "REVIEW_INCOMPLETE"),
+    ("just normal text", None),
+    ("", None),
+    # When several keywords appear, the earliest in the text wins.
+    ("TASK_COMPLETE REVIEW_OKAY", "TASK_COMPLETE"),
+    ("REVIEW_OKAY, not TASK_COMPLETE", "REVIEW_OKAY"),
+])
+def test_find_keyword(text, expected):
+    assert claude_loop.find_keyword(text) == expected
 
 
 # --- Integration tests: main() dispatch ---
@@ -98,32 +94,30 @@ class TestStart:
         assert result.returncode == 0
         assert read_loop_file(dot_claude) == {"iteration": 1, "prompt": "Fix the bug", "total": 5}
 
-    def test_multiline_task(self, tmp_path):
-        proj, dot_claude = make_project(tmp_path)
-        run_start(proj, "3 Fix the bug.\nAlso update tests.")
-        assert read_loop_file(dot_claude)["prompt"] == "Fix the bug.\nAlso update tests."
-
-    def test_curly_braces(self, tmp_path):
-        proj, dot_claude = make_project(tmp_path)
-        run_start(proj, "2 Fix the {name} field")
-        assert read_loop_file(dot_claude)["prompt"] == "Fix the {name} field"
-
-    def test_shell_metacharacters(self, tmp_path):
-        proj, dot_claude = make_project(tmp_path)
-        run_start(proj, "1 echo $HOME && rm -rf /; don't")
-        assert read_loop_file(dot_claude)["prompt"] == "echo $HOME && rm -rf /; don't"
-
-    def test_quotes(self, tmp_path):
+    @pytest.mark.parametrize("stdin_text,expected_prompt", [
+        ("3 Fix the bug.\nAlso update tests.", "Fix the bug.\nAlso update tests."),
+        ("2 Fix the {name} field", "Fix the {name} field"),
+        ("1 echo $HOME && rm -rf /; don't", "echo $HOME && rm -rf /; don't"),
+        ("""2 Fix the "parser" and it's 'edge cases'""", """Fix the "parser" and it's 'edge cases'"""),
+    ], ids=["multiline", "curly_braces", "shell_metacharacters", "quotes"])
+    def test_prompt_passed_through(self, tmp_path, stdin_text, expected_prompt):
         proj, dot_claude = make_project(tmp_path)
-        run_start(proj, """2 Fix the "parser" and it's 'edge cases'""")
-        assert read_loop_file(dot_claude)["prompt"] == """Fix the "parser" and it's 'edge cases'"""
+        run_start(proj, stdin_text)
+        assert read_loop_file(dot_claude)["prompt"] == expected_prompt
 
-    def test_no_dot_claude_dir(self, tmp_path):
-        # No .claude directory — should fail.
-        result = run_start(tmp_path, "3 Do stuff")
+    def test_no_dot_claude_dir(self, monkeypatch):
+        # No .claude directory — should fail. Fake the cwd instead of touching disk.
+        monkeypatch.setattr(claude_loop.Path, "cwd", lambda: Path("/nonexistent-no-claude"))
+        result = run_start(os.curdir, "3 Do stuff")
         assert result.returncode == 1
         assert "Not in a project" in result.stderr
 
+    def test_dot_claude_created_after_failed_start(self, tmp_path):
+        assert run_start(tmp_path, "3 Do stuff").returncode == 1
+        proj, dot_claude = make_project(tmp_path)
+        assert run_start(proj, "3 Do stuff").returncode == 0
+        assert read_loop_file(dot_claude)["prompt"] == "Do stuff"
+
     def test_empty_stdin(self, tmp_path):
         proj, dot_claude = make_project(tmp_path)
         result = run_start(proj, "")
@@ -150,6 +144,11 @@ class TestStart:
         assert result.returncode == 0
         assert "No active loop" in result.stdout
 
+    def test_no_temp_file_left_behind(self, tmp_path):
+        proj, dot_claude = make_project(tmp_path)
+        run_start(proj, "5 Fix the bug")
+        assert sorted(p.name for p in dot_claude.iterdir()) == ["loop.json"]
+
     def test_no_overwrite_active_loop(self, tmp_path):
         proj, dot_claude = make_project(tmp_path)
         existing = {"iteration": 3, "prompt": "old task", "total": 5}
@@ -161,73 +160,48 @@ class TestStart:
 # --- Integration tests: hook state machine ---
 
 class TestHookStateMachine:
-    """Test the hook by calling claude-loop hook as a subprocess with crafted events.
+    """Test the hook by calling claude-loop hook in-process with crafted events.
 
     This tests the full state machine including file I/O, without needing
     a live Claude Code instance.
     """
 
-    def test_first_hook_continues(self, tmp_path):
-        """First hook increments iteration and outputs work prompt."""
+    @pytest.mark.parametrize("init,msg,reason_substr,next_iteration", [
+        ((1, "Write hello world", 3), "I'll start working on this.", "Loop iteration", 2),
+        ((1, "Do the thing", 5), "Made some progress.", "Loop iteration", 2),
+        ((2, "Build feature X", 5), "Done! TASK_COMPLETE", "Verification", 3),
+        ((3, "Build feature X", 5), "Everything looks good. REVIEW_OKAY", "verified", None),
+        ((3, "Build feature X", 5), "Found a bug. REVIEW_INCOMPLETE", "Loop iteration", 4),
+        ((3, "Do stuff", 3), "Still working...", "exhausted", None),
+    ], ids=[
+        "first_hook", "continuation", "task_complete", "review_okay",
+        "review_incomplete", "iterations_exhausted",
+    ])
+    def test_transition(self, tmp_path, init, msg, reason_substr, next_iteration):
+        """A next_iteration of None means the loop ends and loop.json is deleted."""
         proj, dot_claude = make_project(tmp_path)
-        write_loop_file(dot_claude, 1, "Write hello world", 3)
+        iteration, prompt, total = init
+        write_loop_file(dot_claude, iteration, prompt, total)
 
-        decision = run_hook(proj, make_event("I'll start working on this."))
+        decision = run_hook(proj, make_event(msg))
 
         assert decision["decision"] == "block"
-        assert "Loop iteration" in decision["reason"]
-        assert "Write hello world" in decision["reason"]
-        assert read_loop_file(dot_claude) == {"iteration": 2, "prompt": "Write hello world", "total": 3}
-
-    def test_normal_continuation(self, tmp_path):
-        proj, dot_claude = make_project(tmp_path)
-        write_loop_file(dot_claude, 1, "Do the thing", 5)
-
-        decision = run_hook(proj, make_event("Made some progress."))
-
-        assert decision["decision"] == "block"
-        assert "Loop iteration" in decision["reason"]
-        assert read_loop_file(dot_claude)["iteration"] == 2
-
-    def test_task_complete_triggers_verification(self, tmp_path):
+        assert reason_substr.lower() in decision["reason"].lower()
+        if next_iteration is None:
+            assert read_loop_file(dot_claude) is None
+        else:
+            assert prompt in decision["reason"]
+            assert read_loop_file(dot_claude) == {"iteration": next_iteration, "prompt": prompt, "total": total}
+
+    def test_keyword_only_checked_in_message_tail(self, tmp_path):
         proj, dot_claude = make_project(tmp_path)
         write_loop_file(dot_claude, 2, "Build feature X", 5)
 
-        decision = run_hook(proj, make_event("Done! TASK_COMPLETE"))
-
-        assert decision["decision"] == "block"
-        assert "Verification" in decision["reason"]
-        assert "Build feature X" in decision["reason"]
-        assert read_loop_file(dot_claude) is not None
-
-    def test_review_okay_ends_loop(self, tmp_path):
-        proj, dot_claude = make_project(tmp_path)
-        write_loop_file(dot_claude, 3, "Build feature X", 5)
-
-        decision = run_hook(proj, make_event("Everything looks good. REVIEW_OKAY"))
-
-        assert decision["decision"] == "block"
-        assert "verified" in decision["reason"].lower()
-        assert read_loop_file(dot_claude) is None
-
-    def test_review_incomplete_continues(self, tmp_path):
-        proj, dot_claude = make_project(tmp_path)
-        write_loop_file(dot_claude, 3, "Build feature X", 5)
-
-        decision = run_hook(proj, make_event("Found a bug. REVIEW_INCOMPLETE"))
-
-        assert decision["decision"] == "block"
+        decision = run_hook(proj, make_event("TASK_COMPLETE" + " filler" * 200))
         assert "Loop iteration" in decision["reason"]
-        assert read_loop_file(dot_claude)["iteration"] == 4
 
-    def test_iterations_exhausted(self, tmp_path):
-        proj, dot_claude = make_project(tmp_path)
-        write_loop_file(dot_claude, 3, "Do stuff", 3)
-
-        decision = run_hook(proj, make_event("Still working..."))
-
-        assert "exhausted" in decision["reason"].lower()
-        assert read_loop_file(dot_claude) is None
+        decision = run_hook(proj, make_event(" filler" * 200 + " TASK_COMPLETE"))
+        assert "Verification" in decision["reason"]
 
     def test_no_loop_file_silent_exit(self, tmp_path):
         proj, _ = make_project(tmp_path)
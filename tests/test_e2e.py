@@ -5,6 +5,7 @@ sends Escape to interrupt, and verifies hook behavior via log files.
 
 Requires: claude CLI, valid API credentials, network access.
 Run with:  pytest tests/test_e2e.py -v -s
+Parallel:  pytest tests/test_e2e.py -n auto  (pytest-xdist; one claude per worker)
 Skip with: SKIP_E2E=1 pytest
 """
 
@@ -12,7 +13,7 @@ import json
 import os
 import pty
 import re
-import select
+import selectors
 import signal
 import shutil
 import time
@@ -23,63 +24,33 @@ import pytest
 PROJECT_ROOT = Path(__file__).parent.parent
 ESC = b'\x1b'
 
+CLAUDE_BIN = shutil.which("claude")
+
 pytestmark = pytest.mark.skipif(
-    os.environ.get("SKIP_E2E") or shutil.which("claude") is None,
+    bool(os.environ.get("SKIP_E2E")) or CLAUDE_BIN is None,
     reason="E2E tests require claude CLI (set SKIP_E2E=1 to skip)",
 )
 
 
 # --- PTY helpers ---
 
-def pty_read_until(fd, pattern, timeout=60):
-    """Read from PTY fd until pattern found or timeout. Returns (data, found)."""
-    buf = b''
-    deadline = time.monotonic() + timeout
-    if isinstance(pattern, str):
-        pattern = pattern.encode()
-    while time.monotonic() < deadline:
-        remaining = deadline - time.monotonic()
-        r, _, _ = select.select([fd], [], [], min(remaining, 0.1))
-        if r:
-            try:
-                data = os.read(fd, 4096)
-                if not data:
-                    break
-                buf += data
-                if pattern in buf:
-                    return buf, True
-            except OSError:
-                break
-    return buf, False
-
+# CSI sequences (colors, cursor movement) and OSC sequences (titles, links).
+ANSI_RE = re.compile(rb'\x1b\[[0-9;]*[a-zA-Z]|\x1b\][^\x07]*\x07')
 
-def pty_drain(fd, timeout=2.0):
-    """Read all available data from PTY."""
-    buf = b''
-    deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        r, _, _ = select.select([fd], [], [], min(deadline - time.monotonic(), 0.1))
-        if r:
-            try:
-                data = os.read(fd, 4096)
-                if not data:
-                    break
-                buf += data
-            except OSError:
-                break
-    return buf
 
-
-def strip_ansi(text):
-    """Remove ANSI escape sequences from terminal output."""
-    text = re.sub(r'\x1b\[[0-9;]*[a-zA-Z]', '', text)
-    text = re.sub(r'\x1b\][^\x07]*\x07', '', text)
-    return text
+def strip_ansi(data):
+    """Remove ANSI escape sequences from raw terminal output and decode it."""
+    return ANSI_RE.sub(b'', data).decode("utf-8", errors="replace")
 
 
 # Input prompt marker: Claude Code shows "shift+tab" hint when ready for input.
 INPUT_READY = b"shift+tab"
 
+READ_SIZE = 65536
+
+# How often file-based wait conditions are rechecked while the PTY is quiet.
+POLL_INTERVAL = 0.1
+
 
 # --- Test infrastructure ---
 
@@ -99,20 +70,35 @@ class ClaudePTY:
         self.hook_log = tmp_path / "hook_calls.jsonl"
         self.loop_json = dot_claude / "loop.json"
         self._setup_hook(tmp_path)
+        # Read position and parsed events, so polling only parses new log lines.
+        self._hook_offset = 0
+        self._hook_events = []
 
         self.pid = None
         self.fd = None
+        self._sel = selectors.DefaultSelector()
+        # Monotonic time by which the current test must finish; None for no limit.
+        self.deadline = None
 
     def _setup_hook(self, tmp_path):
-        hook_wrapper = tmp_path / "hook_wrapper.sh"
+        hook_wrapper = tmp_path / "hook_wrapper.py"
         self.settings_file = tmp_path / "settings.json"
 
+        # Log the event and run the hook in one Python process, no bash in between.
         hook_wrapper.write_text(f"""\
-#!/bin/bash
-EVENT=$(cat)
-echo "$EVENT" >> {self.hook_log}
-cd {self.project_dir}
-echo "$EVENT" | python3 {PROJECT_ROOT}/claude_loop.py hook
+#!/usr/bin/env python3
+import io
+import os
+import sys
+event = sys.stdin.read()
+with open({str(self.hook_log)!r}, "a") as f:
+    f.write(event.rstrip("\\n") + "\\n")
+os.chdir({str(self.project_dir)!r})
+sys.path.insert(0, {str(PROJECT_ROOT)!r})
+sys.argv = ["claude-loop", "hook"]
+sys.stdin = io.StringIO(event)
+import claude_loop
+claude_loop.main()
 """)
         hook_wrapper.chmod(0o755)
 
@@ -127,7 +113,8 @@ echo "$EVENT" | python3 {PROJECT_ROOT}/claude_loop.py hook
 
     def spawn(self):
         """Spawn claude in a PTY. Must call cleanup() when done."""
-        env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+        env = os.environ.copy()
+        env.pop("CLAUDECODE", None)
         env["TERM"] = "xterm-256color"
         env["COLUMNS"] = "120"
         env["LINES"] = "40"
@@ -135,8 +122,8 @@ echo "$EVENT" | python3 {PROJECT_ROOT}/claude_loop.py hook
         pid, fd = pty.fork()
         if pid == 0:
             os.chdir(str(self.project_dir))
-            os.execvpe("claude", [
-                "claude", "--model", "haiku",
+            os.execve(CLAUDE_BIN, [
+                CLAUDE_BIN, "--model", "haiku",
                 "--dangerously-skip-permissions",
                 "--setting-sources", "project,local",
                 "--settings", str(self.settings_file),
@@ -144,26 +131,82 @@ echo "$EVENT" | python3 {PROJECT_ROOT}/claude_loop.py hook
 
         self.pid = pid
         self.fd = fd
+        self._sel.register(fd, selectors.EVENT_READ)
 
         # Handle the folder trust dialog
-        _, found = pty_read_until(fd, b"trust", timeout=20)
+        _, found = self._read_until(b"trust", timeout=20)
         assert found, "Claude failed to show trust dialog"
         os.write(fd, b"\r")  # Press Enter to confirm trust
 
         # Wait for input prompt
-        _, found = pty_read_until(fd, INPUT_READY, timeout=20)
+        _, found = self._read_until(INPUT_READY, timeout=20)
         assert found, "Claude failed to reach input prompt"
-        pty_drain(fd, timeout=1)
+        self._drain(timeout=1)
+
+    def _deadline_for(self, timeout):
+        """Absolute deadline for a wait of timeout seconds, capped by the test deadline."""
+        deadline = time.monotonic() + timeout
+        return deadline if self.deadline is None else min(deadline, self.deadline)
+
+    def _check_deadline(self, what):
+        """Raise TimeoutError naming the wait in progress if the test deadline passed."""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TimeoutError(f"E2E test deadline passed while {what}")
+
+    def _read(self, timeout):
+        """Read available PTY output, waiting up to timeout.
+
+        Returns b'' on timeout and None once the PTY is closed.
+        """
+        if not self._sel.select(timeout):
+            return b''
+        try:
+            return os.read(self.fd, READ_SIZE) or None
+        except OSError:
+            return None
+
+    def _read_until(self, pattern, timeout=60):
+        """Read PTY output until pattern found or timeout. Returns (data, found)."""
+        buf = bytearray()
+        deadline = self._deadline_for(timeout)
+        if isinstance(pattern, str):
+            pattern = pattern.encode()
+        while (remaining := deadline - time.monotonic()) > 0:
+            data = self._read(remaining)
+            if data is None:
+                break
+            # Only search the new data, plus enough overlap for a split match.
+            start = max(0, len(buf) - len(pattern) + 1)
+            buf += data
+            if buf.find(pattern, start) != -1:
+                return bytes(buf), True
+        self._check_deadline(f"waiting for {pattern!r}")
+        return bytes(buf), False
+
+    def _drain(self, timeout=2.0):
+        """Read all PTY output that arrives within timeout."""
+        buf = bytearray()
+        deadline = self._deadline_for(timeout)
+        while (remaining := deadline - time.monotonic()) > 0:
+            data = self._read(remaining)
+            if data is None:
+                break
+            buf += data
+        self._check_deadline("draining output")
+        return bytes(buf)
 
     def submit(self, text):
         """Type text and press Enter. Waits for TUI to register the input."""
         if isinstance(text, str):
             text = text.encode()
+        # Discard pending output so the echo check below only sees new output.
+        while self._read(0):
+            pass
         os.write(self.fd, text)
         # Wait for the TUI to echo back at least the first few characters,
         # confirming it registered the input before we press Enter.
         prefix = text[:8]
-        pty_read_until(self.fd, prefix, timeout=5)
+        self._read_until(prefix, timeout=5)
         os.write(self.fd, b"\r")
 
     def send_escape(self):
@@ -172,69 +215,91 @@ echo "$EVENT" | python3 {PROJECT_ROOT}/claude_loop.py hook
 
     def wait_for_input_ready(self, timeout=30):
         """Wait for the input prompt to appear (TUI ready for commands)."""
-        buf, found = pty_read_until(self.fd, INPUT_READY, timeout=timeout)
-        pty_drain(self.fd, timeout=0.5)
+        buf, found = self._read_until(INPUT_READY, timeout=timeout)
+        self._drain(timeout=0.5)
         return found
 
     def wait_for(self, pattern, timeout=90):
         """Wait for pattern to appear in terminal output."""
-        buf, found = pty_read_until(self.fd, pattern, timeout=timeout)
-        return strip_ansi(buf.decode("utf-8", errors="replace")), found
+        buf, found = self._read_until(pattern, timeout=timeout)
+        return strip_ansi(buf), found
 
     def drain(self, timeout=3.0):
         """Drain remaining output."""
-        return strip_ansi(pty_drain(self.fd, timeout).decode("utf-8", errors="replace"))
+        return strip_ansi(self._drain(timeout))
+
+    def _wait(self, predicate, timeout, what):
+        """Drain PTY output until predicate() holds or timeout. Returns whether it held."""
+        deadline = self._deadline_for(timeout)
+        while not predicate():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._check_deadline(what)
+                return False
+            # Draining keeps the PTY buffer from filling up and blocking claude.
+            if self._read(min(remaining, POLL_INTERVAL)) is None:
+                return predicate()
+        return True
 
     def wait_for_hook_calls(self, n, timeout=120):
         """Wait until at least n hook calls have been logged."""
-        deadline = time.monotonic() + timeout
-        while time.monotonic() < deadline:
-            if self.count_hook_calls() >= n:
-                return True
-            # Drain output to keep the PTY buffer from filling up
-            pty_drain(self.fd, timeout=0.5)
-        return False
+        return self._wait(
+            lambda: self.count_hook_calls() >= n, timeout, f"waiting for {n} hook calls")
 
     def wait_for_loop_end(self, timeout=180):
         """Wait until loop.json is deleted (loop finished)."""
-        deadline = time.monotonic() + timeout
-        while time.monotonic() < deadline:
-            pty_drain(self.fd, timeout=0.5)
-            if not self.loop_file_exists() and self.count_hook_calls() >= 1:
-                return True
-        return False
+        return self._wait(
+            lambda: not self.loop_file_exists() and self.count_hook_calls() >= 1, timeout,
+            "waiting for the loop to end")
 
     def wait_for_exit(self, timeout=30):
         """Wait for the claude process to exit."""
-        deadline = time.monotonic() + timeout
-        while time.monotonic() < deadline:
-            pty_drain(self.fd, timeout=0.5)
-            result = os.waitpid(self.pid, os.WNOHANG)
-            if result[0] != 0:
+        deadline = self._deadline_for(timeout)
+        while (remaining := deadline - time.monotonic()) > 0:
+            # The PTY closes when claude exits, so block on reaping it then.
+            closed = self._read(remaining) is None
+            pid, _ = os.waitpid(self.pid, 0 if closed else os.WNOHANG)
+            if pid != 0:
                 self.pid = None
                 return True
+        self._check_deadline("waiting for claude to exit")
         return False
 
-    def count_hook_calls(self):
+    def _read_hook_log(self):
+        """Parse hook log lines appended since the last call."""
         if not self.hook_log.exists():
-            return 0
-        text = self.hook_log.read_text().strip()
-        if not text:
-            return 0
-        return sum(1 for line in text.split("\n") if line.strip())
+            return
+        with self.hook_log.open("rb") as f:
+            f.seek(self._hook_offset)
+            chunk = f.read()
+        # Leave a partially written last line for the next call.
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        self._hook_offset += len(complete)
+        self._hook_events.extend(json.loads(line) for line in complete.splitlines() if line.strip())
+
+    def count_hook_calls(self):
+        self._read_hook_log()
+        return len(self._hook_events)
 
     def parse_hook_log(self):
-        if not self.hook_log.exists():
-            return []
-        events = []
-        for line in self.hook_log.read_text().strip().split("\n"):
-            if line.strip():
-                events.append(json.loads(line))
-        return events
+        self._read_hook_log()
+        return list(self._hook_events)
 
     def loop_file_exists(self):
         return self.loop_json.exists()
 
+    def reset(self):
+        """Return the running instance to a fresh state between tests."""
+        # Without a loop file, any turn still in flight ends at its next Stop.
+        self.loop_json.unlink(missing_ok=True)
+        self.send_escape()
+        self._drain(timeout=0.5)
+        self.submit("/clear")
+        assert self.wait_for_input_ready(timeout=30), "Prompt did not return after /clear"
+        self.hook_log.unlink(missing_ok=True)
+        self._hook_offset = 0
+        self._hook_events = []
+
     def cleanup(self):
         """Kill the claude process."""
         if self.pid is not None:
@@ -247,24 +312,19 @@ echo "$EVENT" | python3 {PROJECT_ROOT}/claude_loop.py hook
             except ChildProcessError:
                 pass
             self.pid = None
+        self._sel.close()
 
 
 E2E_TIMEOUT = 120  # seconds per test
 
 
-@pytest.fixture
-def claude(tmp_path):
-    """Fixture that provides a started ClaudePTY instance with a timeout."""
-    prev = signal.signal(signal.SIGALRM, lambda *_: (_ for _ in ()).throw(
-        TimeoutError(f"E2E test exceeded {E2E_TIMEOUT}s timeout")))
-    signal.alarm(E2E_TIMEOUT)
-
-    c = ClaudePTY(tmp_path)
+@pytest.fixture(scope="session")
+def claude_session(tmp_path_factory):
+    """Spawn one ClaudePTY instance shared by all tests in the session."""
+    c = ClaudePTY(tmp_path_factory.mktemp("e2e"))
     c.spawn()
     yield c
 
-    signal.alarm(0)
-    signal.signal(signal.SIGALRM, prev)
     # Try graceful exit
     try:
         c.send_escape()
@@ -276,6 +336,15 @@ def claude(tmp_path):
     c.cleanup()
 
 
+@pytest.fixture
+def claude(claude_session):
+    """Fixture that provides the shared ClaudePTY, reset, with a per-test deadline."""
+    claude_session.deadline = time.monotonic() + E2E_TIMEOUT
+    claude_session.reset()
+    yield claude_session
+    claude_session.deadline = None
+
+
 # --- Test tasks ---
 # Designed for haiku: extremely explicit, no ambiguity, no state tracking needed.
 